@@ -10,6 +10,9 @@ Usa la GitHub Search API (commits endpoint).
 Requisiti:
   - Python 3.8+
   - pip install requests
+  - Opzionale: pip install pandas pyarrow (lettura piu' veloce del CSV)
+  - Opzionale: pip install numpy (aggregati del riepilogo)
+  - Opzionale: pip install orjson (parsing JSON piu' veloce)
   - Un GitHub Personal Access Token (gratuito) impostato come variabile d'ambiente:
     export GITHUB_TOKEN="ghp_tuotoken"
 
@@ -23,32 +26,67 @@ Uso:
   # Ultima settimana (default se nessun parametro)
   python claude_github_tracker.py
 
+  # Aggiorna i conteggi Claude riusando i total_commits gia' salvati
+  python claude_github_tracker.py --from 2026-01-01 --to 2026-02-15 --total-source stored
+
+  # Conteggi separati dei due pattern oltre alla query combinata
+  python claude_github_tracker.py --date 2026-02-10 --detailed
+
+  # Piu' giorni in parallelo (il rate limit resta condiviso)
+  python claude_github_tracker.py --from 2026-01-01 --to 2026-02-15 --workers 8
+
 Output CSV (data/claude_commits_daily.csv):
-  date, co_authored, generated, total_commits
+  date, co_authored, generated, total_commits, claude_commits
+
+Archivio locale (data/tracker.sqlite, non versionato):
+  stessi dati del CSV con upsert per data, piu' la cache dei conteggi delle
+  query: i conteggi ottenuti almeno due giorni dopo la loro data non vengono
+  piu' richiesti all'API, gli altri dopo un'ora (--refresh per ignorare la
+  cache).
 
 Note:
-  - co_authored e generated sono i conteggi separati per ciascuna query.
-  - I due pattern possono avere sovrapposizione (uno stesso commit puo'
-    matchare entrambi). Usare max() per la stima conservativa, somma per
-    l'upper bound.
+  - claude_commits e' il conteggio della query combinata (pattern
+    co-authored OR generated): l'unione calcolata da GitHub, senza doppi
+    conteggi dei commit che matchano entrambi i pattern.
+  - co_authored e generated sono i conteggi separati delle due query: presenti
+    nelle righe storiche raccolte prima della query combinata (per quelle
+    righe la stima conservativa e' max(co_authored, generated)) e in quelle
+    raccolte con --detailed.
   - total_commits e' il numero totale di commit pubblici su GitHub per quel giorno
     (denominatore per calcolare la percentuale di adozione).
 """
 
-import os
-import sys
 import csv
 import logging
-import time
+import sqlite3
 import argparse
-from datetime import datetime, timedelta
+import queue
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta, timezone
 from pathlib import Path
 
+from gh_api import (
+    GITHUB_TOKEN,
+    MAX_SEARCH_RESULTS,
+    PER_PAGE,
+    QUERY_CO_AUTHORED,
+    QUERY_COMBINED,
+    QUERY_GENERATED,
+    GitHubSearchClient,
+)
+
+try:
+    import pandas as pd
+    import pyarrow  # noqa: F401  (engine di pd.read_csv)
+except ImportError:
+    pd = None
+
 try:
-    import requests
+    import numpy as np
 except ImportError:
-    print("Installa requests: pip install requests")
-    sys.exit(1)
+    np = None
 
 logging.basicConfig(
     level=logging.INFO,
@@ -60,172 +98,421 @@ log = logging.getLogger(__name__)
 
 # --- Configurazione ---
 
-GITHUB_TOKEN = os.environ.get("GITHUB_TOKEN", "")
-API_BASE = "https://api.github.com"
-SEARCH_COMMITS_URL = f"{API_BASE}/search/commits"
-
-# Pattern di ricerca per identificare commit di Claude Code
-QUERY_CO_AUTHORED = '"Co-authored-by" "anthropic.com"'
-QUERY_GENERATED = '"Generated with Claude Code"'
-
 # File di output
 OUTPUT_DIR = Path("data")
 OUTPUT_CSV = OUTPUT_DIR / "claude_commits_daily.csv"
-CSV_FIELDS = ["date", "co_authored", "generated", "total_commits"]
+CSV_FIELDS = ["date", "co_authored", "generated", "total_commits", "claude_commits"]
+
+# Archivio locale (SQLite): dati giornalieri e cache di ETag/Last-Modified
+# per (date, query). Il CSV resta il formato pubblicato per la dashboard;
+# a ogni avvio le sue righe vengono importate nel database.
+DB_PATH = OUTPUT_DIR / "tracker.sqlite"
 
-# Rate limiting
-REQUESTS_PER_MINUTE = 10  # conservativo (limite reale: 30 per autenticati)
-REQUEST_DELAY = 60 / REQUESTS_PER_MINUTE
+# Concorrenza: giorni analizzati in parallelo. Il ritmo complessivo resta
+# governato dal rate limit, condiviso tra tutti i thread.
+MAX_WORKERS = 4
+
+# Le righe del CSV sono scritte da un thread dedicato: flush ogni
+# CSV_FLUSH_EVERY righe, o appena la coda resta vuota.
+CSV_FLUSH_EVERY = 10
 
 
 # --- Funzioni ---
 
-def get_headers():
-    """Costruisce gli header per le richieste all'API GitHub."""
-    headers = {
-        "Accept": "application/vnd.github.cloak-preview+json",
-        "X-GitHub-Api-Version": "2022-11-28",
-    }
-    if GITHUB_TOKEN:
-        headers["Authorization"] = f"Bearer {GITHUB_TOKEN}"
-    return headers
+# Client condiviso da tutti i thread: sessione, rate limit e cache dei
+# conteggi (vedi gh_api)
+client = GitHubSearchClient()
 
 
-def get_commit_count(date_str, query=""):
+def committer_day(item):
     """
-    Interroga l'API per il total_count di commit che matchano la query per una data.
+    Giorno UTC (YYYY-MM-DD) del committer di un risultato della ricerca.
 
-    Usa una singola richiesta con per_page=1 per leggere solo total_count,
-    senza scaricare i dettagli degli item.
+    La data arriva con il fuso orario del committer (es. 23:30-08:00): va
+    convertita in UTC per coincidere con il giorno delle query giornaliere
+    committer-date:YYYY-MM-DD.
     """
-    q = f"{query} committer-date:{date_str}" if query else f"committer-date:{date_str}"
-    params = {"q": q, "per_page": 1}
+    committed = datetime.fromisoformat(item["commit"]["committer"]["date"].replace("Z", "+00:00"))
+    return committed.astimezone(timezone.utc).date().isoformat()
 
-    try:
-        response = requests.get(
-            SEARCH_COMMITS_URL,
-            headers=get_headers(),
-            params=params,
-        )
 
-        if response.status_code == 403:
-            reset_time = int(response.headers.get("X-RateLimit-Reset", 0))
-            wait = max(reset_time - int(time.time()), 10)
-            log.warning("Rate limit raggiunto, attendo %ds...", wait)
-            time.sleep(wait)
-            return get_commit_count(date_str, query)
+def get_commit_counts_range(dates, query):
+    """
+    Conteggi giornalieri di una query per una lista ordinata di date.
+
+    Interroga l'intero intervallo con committer-date:A..B e pagina i
+    risultati (fino a 1000) finche' costa meno delle query giornaliere:
+    i commit vengono poi raggruppati per giorno UTC del committer.
+    Altrimenti l'intervallo viene diviso a meta' ricorsivamente; le query
+    giornaliere restano le foglie della ricorsione.
+    """
+    counts = {}
+    _count_range(dates, query, counts)
+    return counts
 
-        if response.status_code == 200:
-            count = response.json().get("total_count", 0)
-            return count
 
-        log.warning("Query failed for %s (HTTP %d): %s", date_str, response.status_code, q)
-    except Exception as e:
-        log.error("Error querying %s: %s", date_str, e)
+def _count_range(dates, query, counts):
+    """Passo ricorsivo di get_commit_counts_range, scrive in counts."""
+    if len(dates) == 1:
+        counts[dates[0]] = client.count(dates[0], query)
+        return
+
+    pages = client.search_pages(f"{query} committer-date:{dates[0]}..{dates[-1]}")
+    data = next(pages, None)
+
+    if data is None:
+        for date_str in dates:
+            counts[date_str] = client.count(date_str, query)
+        return
 
-    return 0
+    total_count = data.get("total_count", 0)
+    # incomplete_results: la ricerca e' andata in timeout, total_count e
+    # item sono parziali e non vanno raggruppati ne' messi in cache
+    incomplete = bool(data.get("incomplete_results"))
+    # Ogni pagina viene raggruppata per giorno UTC appena arriva (vedi
+    # committer_day), senza tenere in memoria fino a 1000 item
+    items = data.get("items", [])
+    fetched = len(items)
+    day_counts = Counter(map(committer_day, items))
+
+    # Paginare conviene solo se servono meno pagine che giorni da contare
+    if (not incomplete and fetched < total_count <= MAX_SEARCH_RESULTS
+            and -(-total_count // PER_PAGE) <= len(dates)):
+        for data in pages:
+            if data.get("incomplete_results"):
+                incomplete = True
+                break
+            items = data.get("items", [])
+            fetched += len(items)
+            day_counts.update(map(committer_day, items))
+
+    if incomplete:
+        log.warning("Risultati incompleti per %s..%s, divido l'intervallo", dates[0], dates[-1])
+    elif total_count <= fetched:
+        for date_str in dates:
+            counts[date_str] = day_counts.get(date_str, 0)
+            client.cache_count(date_str, query, counts[date_str])
+        return
+
+    if not incomplete and total_count > len(dates) * PER_PAGE:
+        # In media piu' di una pagina al giorno: le query giornaliere
+        # costano meno di qualsiasi paginazione dei sotto-intervalli.
+        for date_str in dates:
+            counts[date_str] = client.count(date_str, query)
+    else:
+        mid = len(dates) // 2
+        _count_range(dates[:mid], query, counts)
+        _count_range(dates[mid:], query, counts)
 
 
-def collect_day_data(date_str):
+def collect_day_data(date_str, known_counts=None, detailed=False):
     """
     Raccoglie dati per un singolo giorno.
 
-    Registra separatamente il conteggio per ciascun pattern di ricerca,
-    poi recupera il totale di tutti i commit pubblici come denominatore.
+    Recupera prima il totale di tutti i commit pubblici (denominatore), poi
+    conta i commit Claude con la query combinata. Con detailed=True conta
+    anche i due pattern separati (co_authored, generated), saltandoli se la
+    query combinata e' zero. I conteggi gia' noti (query -> count, es. da
+    get_commit_counts_range; "" per il totale) non vengono richiesti di nuovo.
     """
-    log.info("Cerco: co_authored per %s...", date_str)
-    co_authored = get_commit_count(date_str, QUERY_CO_AUTHORED)
-    log.info("  -> %d commit", co_authored)
-    time.sleep(REQUEST_DELAY)
+    known_counts = known_counts or {}
+    day = {
+        "date": date_str,
+        "co_authored": None,
+        "generated": None,
+        "total_commits": 0,
+        "claude_commits": 0,
+    }
 
-    log.info("Cerco: generated per %s...", date_str)
-    generated = get_commit_count(date_str, QUERY_GENERATED)
-    log.info("  -> %d commit", generated)
-    time.sleep(REQUEST_DELAY)
+    total_commits = known_counts.get("")
+    if total_commits is None:
+        total_commits = client.count(date_str)
+    log.info("  %s total commits: %d", date_str, total_commits)
+    day["total_commits"] = total_commits
+
+    # Senza denominatore il giorno viene scartato da main(): inutile spendere
+    # una richiesta per il numeratore.
+    if total_commits == 0:
+        return day
+
+    claude_commits = known_counts.get(QUERY_COMBINED)
+    if claude_commits is None:
+        claude_commits = client.count(date_str, QUERY_COMBINED)
+    log.info("  %s claude commits: %d", date_str, claude_commits)
+    day["claude_commits"] = claude_commits
+
+    if detailed:
+        # Entrambi i pattern sono sottoinsiemi della query combinata; le due
+        # query sono indipendenti e vengono eseguite in parallelo (stessa
+        # client dei worker di main).
+        fields = {"co_authored": QUERY_CO_AUTHORED, "generated": QUERY_GENERATED}
+        missing = {}
+        for field, query in fields.items():
+            count = known_counts.get(query) if claude_commits else 0
+            if count is None:
+                missing[field] = query
+            day[field] = count
+        if len(missing) > 1:
+            with ThreadPoolExecutor(max_workers=len(missing)) as executor:
+                counts = executor.map(lambda q: client.count(date_str, q), missing.values())
+                day.update(zip(missing, counts))
+        else:
+            for field, query in missing.items():
+                day[field] = client.count(date_str, query)
+        log.info("  %s co_authored: %d, generated: %d",
+                 date_str, day["co_authored"], day["generated"])
+
+    return day
+
+
+def open_db():
+    """Apre il database locale, creando le tabelle e importando il CSV."""
+    OUTPUT_DIR.mkdir(exist_ok=True)
 
-    log.info("Recupero total commits per %s...", date_str)
-    total_commits = get_commit_count(date_str)
-    log.info("  Total commits on %s: %d", date_str, total_commits)
+    conn = sqlite3.connect(DB_PATH)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS daily (
+            date TEXT PRIMARY KEY,
+            co_authored INTEGER,
+            generated INTEGER,
+            total_commits INTEGER,
+            claude_commits INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS query_cache (
+            date TEXT,
+            query TEXT,
+            count INTEGER,
+            etag TEXT,
+            last_modified TEXT,
+            fetched_at REAL,
+            PRIMARY KEY (date, query)
+        );
+    """)
+    # Colonne aggiunte dopo la prima versione dello schema
+    for table, column, column_type in (
+        ("daily", "claude_commits", "INTEGER"),
+        ("query_cache", "fetched_at", "REAL"),
+    ):
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+        if column not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+    # Il CSV e' la fonte pubblicata (aggiornata anche dalla GitHub Action):
+    # le sue righe prevalgono su quelle gia' nel database.
+    save_daily_data(conn, read_csv_rows())
+    return conn
+
+
+def read_csv_rows():
+    """
+    Legge le righe del CSV.
 
-    return {
-        "date": date_str,
-        "co_authored": co_authored,
-        "generated": generated,
-        "total_commits": total_commits,
-    }
+    Se una data compare piu' volte (righe aggiunte da un'esecuzione
+    interrotta prima del riordino finale) vale l'ultima riga. Con pandas e
+    pyarrow installati il parsing e' vettoriale, altrimenti usa csv.DictReader.
+    """
+    if not OUTPUT_CSV.exists():
+        return []
+
+    if pd is not None:
+        df = pd.read_csv(OUTPUT_CSV, engine="pyarrow", dtype={"date": str},
+                         dtype_backend="pyarrow")
+        for field in CSV_FIELDS:
+            if field not in df:
+                df[field] = None
+        return df.drop_duplicates("date", keep="last")[CSV_FIELDS].to_dict("records")
+
+    rows = {}
+    with open(OUTPUT_CSV, "r", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            day = {"date": row["date"]}
+            for field in CSV_FIELDS[1:]:
+                day[field] = int(row[field]) if row.get(field) else None
+            rows[row["date"]] = day
+
+    return list(rows.values())
+
+
+def load_existing_data(conn, from_date, to_date):
+    """
+    Carica i dati gia' raccolti tra from_date e to_date (incluse).
+
+    Il dict e' gia' ordinato per data (ORDER BY e ordine di inserimento):
+    chi lo usa non deve ne' copiarlo ne' riordinarlo.
+    """
+    cursor = conn.execute(
+        f"SELECT {', '.join(CSV_FIELDS)} FROM daily"
+        " WHERE date BETWEEN ? AND ? ORDER BY date",
+        (from_date, to_date),
+    )
+    return {row[0]: dict(zip(CSV_FIELDS, row)) for row in cursor}
 
 
-def load_existing_data():
-    """Carica dati esistenti dal CSV per preservarli tra le esecuzioni."""
-    existing = {}
+def save_daily_data(conn, days):
+    """
+    Inserisce o aggiorna nel database le righe dei giorni indicati.
 
-    if OUTPUT_CSV.exists():
-        with open(OUTPUT_CSV, "r", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                existing[row["date"]] = {
-                    "date": row["date"],
-                    "co_authored": int(row["co_authored"]),
-                    "generated": int(row["generated"]),
-                    "total_commits": int(row["total_commits"]),
-                }
+    I conteggi mancanti (None) non cancellano quelli gia' salvati, cosi' una
+    nuova raccolta non perde co_authored/generated storici.
+    """
+    conn.executemany(
+        "INSERT INTO daily (date, co_authored, generated, total_commits, claude_commits)"
+        " VALUES (:date, :co_authored, :generated, :total_commits, :claude_commits)"
+        " ON CONFLICT(date) DO UPDATE SET"
+        " co_authored = COALESCE(excluded.co_authored, co_authored),"
+        " generated = COALESCE(excluded.generated, generated),"
+        " total_commits = COALESCE(excluded.total_commits, total_commits),"
+        " claude_commits = COALESCE(excluded.claude_commits, claude_commits)",
+        days,
+    )
+    conn.commit()
+
+
+def read_csv_header():
+    """Colonne dell'header del CSV, None se il file non esiste o e' vuoto."""
+    if not OUTPUT_CSV.exists():
+        return None
+    with open(OUTPUT_CSV, "r", newline="", encoding="utf-8") as f:
+        return next(csv.reader(f), None)
+
+
+def open_csv():
+    """
+    Apre il CSV in append (con l'header se il file e' nuovo).
+
+    Restituisce il file e un DictWriter da tenere aperti per tutta
+    l'esecuzione; le colonne in piu' nelle righe vengono ignorate.
+    """
+    OUTPUT_DIR.mkdir(exist_ok=True)
+
+    is_new = not OUTPUT_CSV.exists() or OUTPUT_CSV.stat().st_size == 0
+    f = open(OUTPUT_CSV, "a", newline="", encoding="utf-8")
+    writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction="ignore")
+    if is_new:
+        writer.writeheader()
+    return f, writer
+
+
+def csv_writer_loop(write_queue, errors):
+    """
+    Accoda al CSV le righe ricevute da write_queue, fino al sentinella None.
 
-    return existing
+    Gira in un thread separato: il ciclo delle richieste non attende mai
+    le scritture su disco. Un errore di scrittura viene aggiunto a errors
+    (chi avvia il thread lo controlla dopo il join); le righe successive
+    vengono solo consumate fino al sentinella.
+    """
+    try:
+        f, writer = open_csv()
+        pending = 0
+        with f:
+            while True:
+                day = write_queue.get()
+                if day is None:
+                    return
+                writer.writerow(day)
+                pending += 1
+                if pending >= CSV_FLUSH_EVERY or write_queue.empty():
+                    f.flush()
+                    pending = 0
+    except Exception as e:
+        errors.append(e)
+        while write_queue.get() is not None:
+            pass
 
 
-def save_daily_data(all_data):
-    """Salva i dati giornalieri nel CSV."""
+def export_csv(conn):
+    """Riscrive l'intero CSV dal database, ordinato per data."""
     OUTPUT_DIR.mkdir(exist_ok=True)
 
+    cursor = conn.execute(f"SELECT {', '.join(CSV_FIELDS)} FROM daily ORDER BY date")
     with open(OUTPUT_CSV, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
-        writer.writeheader()
-        for day in sorted(all_data, key=lambda x: x["date"]):
-            writer.writerow({k: day[k] for k in CSV_FIELDS})
+        writer = csv.writer(f)
+        writer.writerow(CSV_FIELDS)
+        writer.writerows(cursor)
 
 
 def generate_date_range(from_date, to_date):
-    """Genera lista di date tra from_date e to_date."""
-    dates = []
-    current = from_date
-    while current <= to_date:
-        dates.append(current.strftime("%Y-%m-%d"))
-        current += timedelta(days=1)
-    return dates
+    """Genera lista di date ISO (YYYY-MM-DD) tra from_date e to_date (incluse)."""
+    base = from_date.toordinal()
+    return [date.fromordinal(base + i).isoformat() for i in range((to_date - from_date).days + 1)]
+
+
+def sum_field(rows, field):
+    """Somma un campo intero su tutte le righe (vettoriale se c'e' numpy)."""
+    if np is not None:
+        values = np.fromiter((r[field] for r in rows), dtype=np.int64, count=len(rows))
+        return int(values.sum())
+    return sum(r[field] for r in rows)
 
 
 def print_summary(all_data):
-    """Stampa un riepilogo dei dati raccolti."""
+    """Stampa un riepilogo dei dati raccolti (gia' in ordine di data)."""
     print("\n" + "=" * 80)
     print("RIEPILOGO")
     print("=" * 80)
-    print(f"{'Data':<14} {'Co-Authored':>12} {'Generated':>10} {'Total':>15} {'%max':>8}")
+    print(f"{'Data':<14} {'Claude':>12} {'Total':>15} {'%':>8}")
     print("-" * 80)
-    for day in sorted(all_data, key=lambda x: x["date"]):
+    for day in all_data:
         pct = ""
-        claude = max(day["co_authored"], day["generated"])
         if day["total_commits"] > 0:
-            pct = f"{claude / day['total_commits'] * 100:.2f}%"
+            pct = f"{day['claude_commits'] / day['total_commits'] * 100:.2f}%"
         print(
-            f"{day['date']:<14} {day['co_authored']:>12,} {day['generated']:>10,}"
+            f"{day['date']:<14} {day['claude_commits']:>12,}"
             f" {day['total_commits']:>15,} {pct:>8}"
         )
     print("-" * 80)
 
     if all_data:
-        tot_co = sum(d["co_authored"] for d in all_data)
-        tot_gen = sum(d["generated"] for d in all_data)
-        tot_all = sum(d["total_commits"] for d in all_data)
-        tot_max = sum(max(d["co_authored"], d["generated"]) for d in all_data)
-        pct = f"{tot_max / tot_all * 100:.2f}%" if tot_all > 0 else ""
+        tot_claude = sum_field(all_data, "claude_commits")
+        tot_all = sum_field(all_data, "total_commits")
+        pct = f"{tot_claude / tot_all * 100:.2f}%" if tot_all > 0 else ""
         print(
-            f"{'TOTALE':<14} {tot_co:>12,} {tot_gen:>10,}"
+            f"{'TOTALE':<14} {tot_claude:>12,}"
             f" {tot_all:>15,} {pct:>8}"
         )
 
     print(f"\nDati salvati in: {OUTPUT_CSV}")
 
 
+def prefetch_counts(dates, args, existing):
+    """
+    Conteggi gia' noti per data (query -> count) prima della raccolta giornaliera.
+
+    I conteggi Claude si raccolgono per intervalli, dividendo solo dove
+    serve: nei periodi con pochi commit bastano poche richieste. Le date con
+    un conteggio valido in cache non vengono interrogate; quelle con
+    ETag/Last-Modified salvati (tipicamente i giorni recenti rieseguiti)
+    restano a collect_day_data, che usa richieste condizionali giornaliere:
+    un 304 non consuma quota, una query su intervallo si'.
+    """
+    queries = [QUERY_COMBINED]
+    if args.detailed:
+        queries += [QUERY_CO_AUTHORED, QUERY_GENERATED]
+
+    known_counts = {d: {} for d in dates}
+    for query in queries:
+        for date_str in dates:
+            count = client.cached_count(date_str, query)
+            if count is not None:
+                known_counts[date_str][query] = count
+        pending = [
+            d for d in dates
+            if query not in known_counts[d] and not client.has_validators(d, query)
+        ]
+        if pending:
+            for date_str, count in get_commit_counts_range(pending, query).items():
+                known_counts[date_str][query] = count
+
+    # Con --total-source stored il denominatore gia' salvato non viene
+    # richiesto di nuovo (per le date passate cambia pochissimo).
+    if args.total_source == "stored":
+        for date_str, row in existing.items():
+            if row["total_commits"] and date_str in known_counts:
+                known_counts[date_str][""] = row["total_commits"]
+
+    return known_counts
+
 # --- Main ---
 
 def main():
@@ -235,6 +522,17 @@ def main():
     parser.add_argument("--to", dest="to_date", help="Data fine range (YYYY-MM-DD)")
     parser.add_argument("--skip-existing", action="store_true",
                         help="Salta date gia' presenti nel CSV")
+    parser.add_argument("--detailed", action="store_true",
+                        help="Raccoglie anche co_authored e generated separati")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Ignora i conteggi in cache e ripete tutte le query")
+    parser.add_argument("--total-source", choices=["search", "stored"], default="search",
+                        help="Origine di total_commits: 'search' lo richiede all'API"
+                             " (salvo un conteggio ancora valido nella cache locale,"
+                             " vedi --refresh), 'stored' riusa quello gia' salvato"
+                             " per la data (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS,
+                        help="Giorni analizzati in parallelo (default: %(default)s)")
     args = parser.parse_args()
 
     if not GITHUB_TOKEN:
@@ -246,50 +544,114 @@ def main():
     if args.date:
         dates = [args.date]
     elif args.from_date:
-        from_dt = datetime.strptime(args.from_date, "%Y-%m-%d")
-        to_dt = datetime.strptime(args.to_date, "%Y-%m-%d") if args.to_date else datetime.now()
+        from_dt = date.fromisoformat(args.from_date)
+        to_dt = date.fromisoformat(args.to_date) if args.to_date else date.today()
         dates = generate_date_range(from_dt, to_dt)
     else:
-        to_dt = datetime.now() - timedelta(days=1)  # ieri, per evitare dati parziali
+        to_dt = date.today() - timedelta(days=1)  # ieri, per evitare dati parziali
         from_dt = to_dt - timedelta(days=7)
         dates = generate_date_range(from_dt, to_dt)
 
+    if not dates:
+        log.info("Nessuna data da processare (--from successiva a --to?).")
+        return
+
     # Carica dati esistenti e merge con i nuovi
-    existing = load_existing_data()
+    conn = open_db()
+    # Un CSV con colonne diverse da CSV_FIELDS (es. senza claude_commits)
+    # viene riscritto subito dal database: le nuove righe non vanno accodate
+    # sotto l'header vecchio.
+    if read_csv_header() not in (None, CSV_FIELDS):
+        log.info("Header del CSV non aggiornato, riscrivo %s", OUTPUT_CSV)
+        export_csv(conn)
+    # dates e' ordinata: gli estremi sono il primo e l'ultimo elemento
+    existing = load_existing_data(conn, dates[0], dates[-1])
     if args.skip_existing:
         dates = [d for d in dates if d not in existing]
 
     if not dates:
         log.info("Nessuna data da processare.")
+        conn.close()
         return
 
     log.info("Claude Code GitHub Tracker")
     log.info("Date da analizzare: %s -> %s (%d giorni)", dates[0], dates[-1], len(dates))
     log.info("Token GitHub: %s", "configurato" if GITHUB_TOKEN else "MANCANTE")
 
-    # Parti dai dati esistenti, i nuovi verranno aggiunti/aggiornati
-    all_data = dict(existing)
-    new_data = []
+    client.load_cache(conn)
+    if args.refresh:
+        # Nessun conteggio delle date da analizzare e' considerato valido: le
+        # loro query vengono ripetute (restano condizionali grazie a
+        # ETag/Last-Modified). La cache delle altre date non cambia.
+        client.expire_cache(dates)
+    new_data = {}
 
-    for i, date_str in enumerate(dates):
-        log.info("[%d/%d] Analisi %s...", i + 1, len(dates), date_str)
+    try:
+        known_counts = prefetch_counts(dates, args, existing)
+
+        # I giorni vengono analizzati in parallelo e salvati appena completati,
+        # senza attendere quelli precedenti; tutte le richieste passano dallo
+        # stesso client, quindi i thread condividono un'unica quota.
+        workers = max(args.workers, 1)
+        # Con --detailed ogni giorno puo' avere due richieste in volo
+        connections = workers * 2 if args.detailed else workers
+        client.resize_pool(connections)
+
+        # Ogni giorno viene salvato nel database e passato al thread che lo
+        # accoda al CSV; se una data era gia' presente o arriva fuori ordine
+        # il CSV viene riesportato (ordinato) una sola volta alla fine.
+        last_saved = conn.execute("SELECT MAX(date) FROM daily").fetchone()[0] or ""
+        needs_rewrite = False
+        write_queue = queue.Queue()
+        writer_errors = []
+        writer_thread = threading.Thread(target=csv_writer_loop,
+                                         args=(write_queue, writer_errors), daemon=True)
+        writer_thread.start()
         try:
-            day_data = collect_day_data(date_str)
-            if day_data["total_commits"] == 0:
-                log.warning("Dati non validi per %s (total_commits=0), skip.", date_str)
-                continue
-            all_data[date_str] = day_data
-            new_data.append(day_data)
-        except Exception as e:
-            log.error("Errore per %s: %s, skip.", date_str, e)
-
-        # Salva progressivamente (tutti i dati: esistenti + nuovi)
-        save_daily_data(list(all_data.values()))
-
-        if i < len(dates) - 1:
-            time.sleep(REQUEST_DELAY)
-
-    print_summary(new_data)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(collect_day_data, d, known_counts[d], args.detailed): d
+                    for d in dates
+                }
+
+                for i, future in enumerate(as_completed(futures), 1):
+                    date_str = futures[future]
+                    log.info("[%d/%d] Completato %s", i, len(dates), date_str)
+                    try:
+                        day_data = future.result()
+                        if day_data["total_commits"] == 0:
+                            log.warning("Dati non validi per %s (total_commits=0), skip.",
+                                        date_str)
+                            continue
+                        new_data[date_str] = day_data
+
+                        # Salva progressivamente
+                        save_daily_data(conn, [day_data])
+                        if date_str <= last_saved:
+                            needs_rewrite = True
+                        last_saved = max(last_saved, date_str)
+                        write_queue.put(day_data)
+                    except Exception as e:
+                        log.error("Errore per %s: %s, skip.", date_str, e)
+        finally:
+            # Le righe ancora in coda vengono scritte prima di chiudere il file
+            write_queue.put(None)
+            writer_thread.join()
+
+        if writer_errors:
+            # Le righe sono comunque nel database: il CSV viene riesportato
+            log.error("Scrittura del CSV fallita (%s), riesporto dal database.",
+                      writer_errors[0])
+            needs_rewrite = True
+        if needs_rewrite:
+            export_csv(conn)
+    finally:
+        # Anche se la raccolta si interrompe, i conteggi gia' ottenuti restano
+        client.save_cache(conn)
+        conn.close()
+
+    # dates e' gia' ordinata (date ISO): nessun sort necessario
+    print_summary([new_data[d] for d in dates if d in new_data])
 
 
 if __name__ == "__main__":
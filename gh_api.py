@@ -0,0 +1,421 @@
+"""
+Client della GitHub Search API (commits), condiviso dagli script.
+
+Raccoglie in GitHubSearchClient tutto cio' che riguarda le richieste:
+sessione HTTP con connessioni keep-alive, rate limit (header X-RateLimit-*,
+Retry-After, backoff) e cache dei conteggi con ETag/Last-Modified,
+persistita nella tabella query_cache del database locale.
+"""
+
+import os
+import sys
+import logging
+import random
+import re
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+except ImportError:
+    print("Installa requests: pip install requests")
+    sys.exit(1)
+
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+log = logging.getLogger(__name__)
+
+
+# --- Configurazione ---
+
+GITHUB_TOKEN = os.environ.get("GITHUB_TOKEN", "")
+API_BASE = "https://api.github.com"
+# La ricerca di commit esiste solo nella REST API: la search GraphQL (v4)
+# supporta i tipi ISSUE, REPOSITORY, USER e DISCUSSION, non COMMIT.
+SEARCH_COMMITS_URL = f"{API_BASE}/search/commits"
+
+# Header comuni a tutte le richieste, costruiti una volta sola e
+# agganciati alla sessione del client.
+HEADERS = {
+    "Accept": "application/vnd.github.cloak-preview+json",
+    "X-GitHub-Api-Version": "2022-11-28",
+    **({"Authorization": f"Bearer {GITHUB_TOKEN}"} if GITHUB_TOKEN else {}),
+}
+
+# Pattern di ricerca per identificare commit di Claude Code, condivisi
+# dal tracker e dalla verifica dell'overlap
+QUERY_CO_AUTHORED = '"Co-authored-by" "anthropic.com"'
+QUERY_GENERATED = '"Generated with Claude Code"'
+# Unione dei due pattern in una sola richiesta
+QUERY_COMBINED = f"({QUERY_CO_AUTHORED}) OR {QUERY_GENERATED}"
+
+# Rate limiting: il ritmo delle richieste e' derivato dagli header
+# X-RateLimit-* di GitHub (limite search: 30 req/min autenticati).
+MAX_REQUEST_DELAY = 60  # attesa massima tra due richieste (secondi)
+RATE_LIMIT_RESERVE = 3  # sotto questa quota residua le richieste vengono distanziate
+MAX_RETRIES = 5  # tentativi per richiesta in caso di 403/429
+REQUEST_TIMEOUT = 30  # secondi
+BACKOFF_BASE = 1.0  # secondi, base del backoff esponenziale
+
+# Lettura di total_count dal body in streaming: le risposte piccole vengono
+# lette fino in fondo (la connessione torna nel pool), oltre questa soglia
+# il resto del body viene scartato.
+COUNT_CHUNK_SIZE = 8192
+COUNT_DRAIN_LIMIT = 64 * 1024
+TOTAL_COUNT_RE = re.compile(rb'"total_count"\s*:\s*(\d+)\s*[,}]')
+
+# Paginazione: la Search API restituisce al massimo 1000 risultati per
+# query, oltre non si puo' paginare.
+PER_PAGE = 100
+MAX_SEARCH_RESULTS = 1000
+
+# Validita' della cache dei conteggi: un conteggio ottenuto almeno
+# CACHE_FINAL_AFTER_DAYS dopo la sua data e' considerato definitivo e non
+# scade, gli altri valgono CACHE_TTL secondi.
+CACHE_TTL = 3600
+CACHE_FINAL_AFTER_DAYS = 2
+CACHE_FIELDS = ("date", "query", "count", "etag", "last_modified", "fetched_at")
+
+POOL_MAXSIZE = 10  # connessioni keep-alive riutilizzabili verso l'API
+
+
+# --- Funzioni ---
+
+def make_adapter(pool_maxsize=POOL_MAXSIZE):
+    """
+    Adapter HTTPS della sessione del client.
+
+    pool_maxsize va tenuto almeno pari alle richieste concorrenti: oltre,
+    urllib3 apre connessioni extra e le scarta dopo l'uso, perdendo il
+    keep-alive. Ripete solo gli errori 5xx transitori: gli errori di
+    connessione/lettura (connect=0, read=0) e i 403/429 sono gestiti da
+    GitHubSearchClient.get, cosi' ogni tentativo ha un solo livello di retry.
+    """
+    return HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=pool_maxsize,
+        max_retries=Retry(total=5, connect=0, read=0, backoff_factor=1,
+                          status_forcelist=[502, 503, 504]),
+    )
+
+
+class RateState:
+    """
+    Stato del rate limit, condiviso tra i thread.
+
+    Viene aggiornato con gli header X-RateLimit-Remaining/Reset di ogni
+    risposta e funziona come un token bucket: finche' la quota residua e'
+    ampia le richieste partono subito, poi vengono distanziate fino al reset.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.remaining = None
+        self.reset = 0
+        self._next_request_at = 0.0
+
+    def update(self, headers):
+        """Registra la quota residua dagli header di una risposta."""
+        try:
+            remaining = int(headers["X-RateLimit-Remaining"])
+            reset = int(headers["X-RateLimit-Reset"])
+        except (KeyError, ValueError):
+            return
+        with self._lock:
+            self.remaining = remaining
+            self.reset = reset
+
+    def next_delay(self):
+        """
+        Prenota lo slot per la prossima richiesta e ritorna i secondi di attesa.
+
+        Nessuna attesa finche' restano almeno RATE_LIMIT_RESERVE richieste;
+        sotto la riserva il tempo che manca al reset viene diviso tra le
+        richieste rimaste (intervallo limitato a MAX_REQUEST_DELAY). Ogni slot
+        prenotato scala la quota residua, cosi' i thread non la contano due volte.
+        """
+        with self._lock:
+            now = time.time()
+            slot = max(now, self._next_request_at)
+            interval = 0.0
+            if self.remaining is not None and slot < self.reset:
+                if self.remaining < RATE_LIMIT_RESERVE:
+                    interval = (self.reset - slot) / (self.remaining + 1)
+                self.remaining = max(self.remaining - 1, 0)
+            self._next_request_at = slot + min(interval, MAX_REQUEST_DELAY)
+        return slot - now
+
+
+def rate_limit_wait(response, attempt):
+    """
+    Secondi da attendere dopo una risposta 403/429.
+
+    Retry-After viene rispettato alla lettera. Con la quota esaurita
+    (X-RateLimit-Remaining = 0) si attende il reset; altrimenti e' un rate
+    limit secondario, di solito breve: backoff esponenziale con jitter,
+    limitato dal tempo che manca al reset.
+    """
+    retry_after = response.headers.get("Retry-After")
+    if retry_after is not None:
+        return int(retry_after)
+
+    reset_wait = int(response.headers.get("X-RateLimit-Reset", 0)) - time.time()
+    if response.headers.get("X-RateLimit-Remaining") == "0":
+        return max(reset_wait, 1)
+
+    cap = reset_wait if reset_wait > 0 else MAX_REQUEST_DELAY
+    return min(cap, random.uniform(BACKOFF_BASE, BACKOFF_BASE * 3 ** attempt))
+
+
+def read_total_count(response):
+    """
+    Legge total_count da una risposta in streaming senza decodificare il JSON.
+
+    total_count e' il primo campo della risposta della Search API, quindi
+    basta il primo blocco del body; il resto viene letto solo se piccolo
+    (COUNT_DRAIN_LIMIT), altrimenti la risposta viene chiusa subito.
+    """
+    head = b""
+    count = None
+    received = 0
+    try:
+        for chunk in response.iter_content(chunk_size=COUNT_CHUNK_SIZE):
+            received += len(chunk)
+            if count is None:
+                head += chunk
+                match = TOTAL_COUNT_RE.search(head)
+                if match:
+                    count = int(match.group(1))
+            if count is not None and received > COUNT_DRAIN_LIMIT:
+                break
+    finally:
+        response.close()
+    return count or 0
+
+
+class GitHubSearchClient:
+    """
+    Client della ricerca di commit, sicuro da usare da piu' thread.
+
+    Possiede la sessione HTTP, lo stato del rate limit e la cache dei
+    conteggi: tutte le richieste fatte attraverso lo stesso client
+    condividono connessioni e quota.
+    """
+
+    def __init__(self, pool_maxsize=POOL_MAXSIZE):
+        self.session = requests.Session()
+        self.session.mount("https://", make_adapter(pool_maxsize))
+        self.session.headers.update(HEADERS)
+        self.rate_state = RateState()
+        # (date, query) -> {"date", "query", "count", "etag", "last_modified", "fetched_at"}
+        self.cache = {}
+
+    def resize_pool(self, pool_maxsize):
+        """Adegua il pool di connessioni al numero di richieste concorrenti."""
+        if pool_maxsize > POOL_MAXSIZE:
+            self.session.mount("https://", make_adapter(pool_maxsize))
+
+    # --- Richieste ---
+
+    def get(self, params, headers=None, stream=False):
+        """
+        GET sulla Search API rispettando il rate limit.
+
+        headers contiene solo eventuali header aggiuntivi (es. richieste
+        condizionali). Su 403/429 riprova fino a MAX_RETRIES volte (vedi
+        rate_limit_wait); se i tentativi si esauriscono ritorna l'ultima
+        risposta ricevuta. Gli errori di rete (timeout, connessione
+        interrotta) vengono ripetuti con backoff esponenziale entro lo stesso
+        budget di tentativi, poi l'eccezione viene rilanciata al chiamante;
+        i 5xx esauriti dall'adapter (RetryError) sono rilanciati subito.
+        """
+        for attempt in range(MAX_RETRIES):
+            time.sleep(self.rate_state.next_delay())
+            try:
+                response = self.session.get(SEARCH_COMMITS_URL, headers=headers, params=params,
+                                            stream=stream, timeout=REQUEST_TIMEOUT)
+            except requests.exceptions.RetryError:
+                # 5xx gia' ripetuti dall'adapter: inutile ricominciare
+                raise
+            except requests.RequestException as e:
+                if attempt == MAX_RETRIES - 1:
+                    log.error("Errore di rete dopo %d tentativi: %s", MAX_RETRIES, e)
+                    raise
+                backoff = min(MAX_REQUEST_DELAY, 2 ** attempt)
+                log.warning("Errore di rete (%s), riprovo tra %ds...", e, backoff)
+                time.sleep(backoff)
+                continue
+            self.rate_state.update(response.headers)
+
+            if response.status_code not in (403, 429) or attempt == MAX_RETRIES - 1:
+                return response
+
+            wait = rate_limit_wait(response, attempt)
+            response.close()
+            log.warning("Rate limit raggiunto (HTTP %d), attendo %.1fs...",
+                        response.status_code, wait)
+            time.sleep(wait)
+
+    def count(self, date_str, query=""):
+        """
+        total_count dei commit che matchano la query per una data.
+
+        Usa una singola richiesta con per_page=1 e legge solo total_count dal
+        body in streaming, senza decodificare gli item. Un conteggio ancora
+        valido in cache (vedi cached_count) non richiede alcuna richiesta; se
+        e' scaduto la richiesta e' condizionale: su 304 ritorna quello salvato.
+        In caso di errore ritorna 0.
+        """
+        count = self.cached_count(date_str, query)
+        if count is not None:
+            return count
+
+        q = f"{query} committer-date:{date_str}" if query else f"committer-date:{date_str}"
+        params = {"q": q, "per_page": 1}
+
+        headers = {}
+        cached = self.cache.get((date_str, query))
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        try:
+            response = self.get(params, headers, stream=True)
+
+            if response.status_code == 304 and cached:
+                response.close()
+                self.cache_count(date_str, query, cached["count"],
+                                 cached["etag"], cached["last_modified"])
+                return cached["count"]
+
+            if response.status_code == 200:
+                count = read_total_count(response)
+                self.cache_count(date_str, query, count, response.headers.get("ETag"),
+                                 response.headers.get("Last-Modified"))
+                return count
+
+            response.close()
+            log.warning("Query failed for %s (HTTP %d): %s", date_str, response.status_code, q)
+        except Exception as e:
+            log.error("Error querying %s: %s", date_str, e)
+
+        return 0
+
+    def search_pages(self, q, max_results=MAX_SEARCH_RESULTS):
+        """
+        Genera le pagine (dict JSON) dei risultati di una query.
+
+        Il numero di pagine si conosce dopo la prima risposta (total_count,
+        limitato a max_results): con pochi risultati non parte nessuna
+        richiesta in piu'. L'ordinamento esplicito per committer-date desc
+        tiene coerenti le pagine tra loro; max_results ridotto restituisce
+        quindi i commit piu' recenti. Si interrompe al primo errore.
+        """
+        params = {"q": q, "per_page": PER_PAGE, "sort": "committer-date", "order": "desc"}
+        pages_needed = 1
+        page = 1
+
+        while page <= pages_needed:
+            try:
+                response = self.get({**params, "page": page})
+                if response.status_code != 200:
+                    log.warning("Search failed (HTTP %d, page %d): %s",
+                                response.status_code, page, q)
+                    return
+                data = json_loads(response.content)
+            except Exception as e:
+                log.error("Error searching %s (page %d): %s", q, page, e)
+                return
+
+            yield data
+
+            if page == 1:
+                available = min(data.get("total_count", 0), max_results, MAX_SEARCH_RESULTS)
+                pages_needed = -(-available // PER_PAGE)
+            if len(data.get("items", [])) < PER_PAGE:
+                return
+            page += 1
+
+    def search(self, q, max_results=MAX_SEARCH_RESULTS):
+        """total_count e item (fino a max_results) di una query; 0 e [] se fallisce."""
+        total_count = 0
+        items = []
+        for page, data in enumerate(self.search_pages(q, max_results), 1):
+            if page == 1:
+                total_count = data.get("total_count", 0)
+            items.extend(data.get("items", []))
+        return total_count, items
+
+    # --- Cache dei conteggi ---
+
+    def cached_count(self, date_str, query):
+        """Conteggio in cache per (date, query) se ancora valido, altrimenti None."""
+        entry = self.cache.get((date_str, query))
+        if entry is None or entry.get("fetched_at") is None:
+            return None
+
+        # Definitivo solo se ottenuto quando il giorno era gia' chiuso da
+        # CACHE_FINAL_AFTER_DAYS: un conteggio preso a giornata in corso
+        # resta soggetto a CACHE_TTL anche quando la data invecchia.
+        final_from = datetime.combine(
+            date.fromisoformat(date_str) + timedelta(days=CACHE_FINAL_AFTER_DAYS),
+            datetime.min.time(), tzinfo=timezone.utc,
+        ).timestamp()
+        if entry["fetched_at"] >= final_from or time.time() - entry["fetched_at"] < CACHE_TTL:
+            return entry["count"]
+        return None
+
+    def has_validators(self, date_str, query):
+        """True se per (date, query) ci sono ETag/Last-Modified per una richiesta condizionale."""
+        entry = self.cache.get((date_str, query))
+        return bool(entry and (entry.get("etag") or entry.get("last_modified")))
+
+    def cache_count(self, date_str, query, count, etag=None, last_modified=None):
+        """Registra in cache il conteggio appena ottenuto per (date, query)."""
+        self.cache[(date_str, query)] = {
+            "date": date_str,
+            "query": query,
+            "count": count,
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": time.time(),
+        }
+
+    def expire_cache(self, dates):
+        """
+        Rende scaduti i conteggi in cache delle date indicate.
+
+        Le query vengono ripetute, ma restano condizionali grazie a
+        ETag/Last-Modified; le altre date restano valide anche nel database.
+        """
+        dates = set(dates)
+        for (date_str, _), entry in self.cache.items():
+            if date_str in dates:
+                entry["fetched_at"] = None
+
+    def load_cache(self, conn):
+        """Carica la cache dalla tabella query_cache del database."""
+        cursor = conn.execute(f"SELECT {', '.join(CACHE_FIELDS)} FROM query_cache")
+        self.cache.update({(row[0], row[1]): dict(zip(CACHE_FIELDS, row)) for row in cursor})
+
+    def save_cache(self, conn):
+        """Salva la cache nella tabella query_cache del database."""
+        conn.executemany(
+            "INSERT INTO query_cache (date, query, count, etag, last_modified, fetched_at)"
+            " VALUES (:date, :query, :count, :etag, :last_modified, :fetched_at)"
+            " ON CONFLICT(date, query) DO UPDATE SET"
+            " count = excluded.count,"
+            " etag = excluded.etag,"
+            " last_modified = excluded.last_modified,"
+            " fetched_at = excluded.fetched_at",
+            list(self.cache.values()),
+        )
+        conn.commit()
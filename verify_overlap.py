@@ -3,24 +3,28 @@
 Verifica overlap tra le due query di ricerca Claude Code.
 
 Scarica fino a 1000 commit per ciascuna query e confronta gli SHA
-per determinare la percentuale di sovrapposizione reale.
+per determinare la percentuale di sovrapposizione reale. Confronta poi
+l'unione con il conteggio della query combinata (OR) da cui il tracker
+ricava claude_commits.
 
 Uso:
   python verify_overlap.py --date 2026-02-14
   python verify_overlap.py --date 2025-03-15  # pochi commit, overlap esatto
+  python verify_overlap.py --date 2026-02-14 --max-pages 1  # campione di 100 SHA
 """
 
-import os
-import sys
-import time
 import argparse
 import logging
 
-try:
-    import requests
-except ImportError:
-    print("Installa requests: pip install requests")
-    sys.exit(1)
+from gh_api import (
+    GITHUB_TOKEN,
+    MAX_SEARCH_RESULTS,
+    PER_PAGE,
+    QUERY_CO_AUTHORED,
+    QUERY_COMBINED,
+    QUERY_GENERATED,
+    GitHubSearchClient,
+)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -29,79 +33,40 @@ logging.basicConfig(
 )
 log = logging.getLogger(__name__)
 
-GITHUB_TOKEN = os.environ.get("GITHUB_TOKEN", "")
-SEARCH_COMMITS_URL = "https://api.github.com/search/commits"
-REQUEST_DELAY = 6
+MAX_PAGES = MAX_SEARCH_RESULTS // PER_PAGE
+
+client = GitHubSearchClient()
 
 QUERIES = {
-    "co_authored": '"Co-authored-by" "anthropic.com"',
-    "generated": '"Generated with Claude Code"',
+    "co_authored": QUERY_CO_AUTHORED,
+    "generated": QUERY_GENERATED,
 }
 
 
-def get_headers():
-    headers = {
-        "Accept": "application/vnd.github.cloak-preview+json",
-        "X-GitHub-Api-Version": "2022-11-28",
-    }
-    if GITHUB_TOKEN:
-        headers["Authorization"] = f"Bearer {GITHUB_TOKEN}"
-    return headers
-
-
-def fetch_shas(date_str, query, label):
-    """Scarica fino a 1000 SHA per una query+data."""
-    full_query = f"{query} committer-date:{date_str}"
-    shas = set()
-    total_count = 0
-    page = 1
-
-    while True:
-        params = {
-            "q": full_query,
-            "per_page": 100,
-            "page": page,
-            "sort": "committer-date",
-            "order": "desc",
-        }
-
-        response = requests.get(SEARCH_COMMITS_URL, headers=get_headers(), params=params)
-
-        if response.status_code == 403:
-            reset_time = int(response.headers.get("X-RateLimit-Reset", 0))
-            wait = max(reset_time - int(time.time()), 10)
-            log.warning("Rate limit, attendo %ds...", wait)
-            time.sleep(wait)
-            continue
-
-        if response.status_code != 200:
-            log.error("HTTP %d per %s", response.status_code, label)
-            break
+def fetch_shas(date_str, query, max_pages=MAX_PAGES):
+    """
+    Scarica fino a max_pages * 100 SHA per una query+data.
 
-        data = response.json()
-        total_count = data.get("total_count", 0)
-        items = data.get("items", [])
-
-        if not items:
-            break
-
-        for item in items:
-            sha = item.get("sha", "")
-            if sha:
-                shas.add(sha)
-
-        if len(items) < 100 or page * 100 >= min(total_count, 1000):
-            break
-
-        page += 1
-        time.sleep(REQUEST_DELAY)
+    Gli SHA sono restituiti come interi a 64 bit (prefisso esadecimale):
+    bastano per intersezione e unione, che e' tutto quello che serve qui.
 
+    Con max_pages ridotto il campione copre solo i commit piu' recenti del
+    giorno (ordinamento per committer-date desc), ma costa meno richieste.
+    """
+    total_count, items = client.search(f"{query} committer-date:{date_str}",
+                                       max_pages * PER_PAGE)
+    # Chiave intera dai primi 64 bit dello SHA: hash e confronti piu'
+    # economici delle stringhe da 40 caratteri; con al massimo 1000
+    # SHA per query le collisioni sono trascurabili.
+    shas = {int(sha[:16], 16) for sha in filter(None, (item.get("sha") for item in items))}
     return total_count, shas
 
 
 def main():
     parser = argparse.ArgumentParser(description="Verifica overlap tra query Claude Code")
     parser.add_argument("--date", required=True, help="Data da verificare (YYYY-MM-DD)")
+    parser.add_argument("--max-pages", type=int, default=MAX_PAGES,
+                        help="Pagine da 100 SHA da scaricare per query (default: %(default)s)")
     args = parser.parse_args()
 
     if not GITHUB_TOKEN:
@@ -112,10 +77,14 @@ def main():
 
     for label, query in QUERIES.items():
         log.info("Scarico SHA per '%s' del %s...", label, date_str)
-        total_count, shas = fetch_shas(date_str, query, label)
+        total_count, shas = fetch_shas(date_str, query, args.max_pages)
         results[label] = {"total_count": total_count, "shas": shas}
         log.info("  total_count=%d, SHA scaricati=%d", total_count, len(shas))
-        time.sleep(REQUEST_DELAY)
+
+    # Conteggio della query combinata usata dal tracker per claude_commits:
+    # deve coincidere con l'unione degli SHA (verifica della sintassi OR)
+    log.info("Conto la query combinata del %s...", date_str)
+    combined_count = client.count(date_str, QUERY_COMBINED)
 
     shas_co = results["co_authored"]["shas"]
     shas_gen = results["generated"]["shas"]
@@ -132,6 +101,7 @@ def main():
     print("-" * 60)
     print(f"Overlap (intersection):   {len(overlap):>10,}")
     print(f"Union (unique commits):   {len(union):>10,}")
+    print(f"Combined query (OR):      {combined_count:>10,}")
 
     if shas_gen:
         pct_gen_in_co = len(overlap) / len(shas_gen) * 100
@@ -141,18 +111,28 @@ def main():
         pct_co_in_gen = len(overlap) / len(shas_co) * 100
         print(f"% co_authored in generated: {pct_co_in_gen:>8.1f}%")
 
-    capped = (results["co_authored"]["total_count"] > 1000
-              or results["generated"]["total_count"] > 1000)
+    sample_size = min(args.max_pages, MAX_PAGES) * PER_PAGE
+    capped = (results["co_authored"]["total_count"] > sample_size
+              or results["generated"]["total_count"] > sample_size)
     if capped:
-        print("\nNota: almeno una query supera 1000 risultati.")
-        print("L'overlap e' calcolato su un campione (max 1000 SHA per query).")
+        print(f"\nNota: almeno una query supera {sample_size} risultati.")
+        print(f"L'overlap e' calcolato su un campione (max {sample_size} SHA per query).")
     else:
         print("\nDati completi: tutti gli SHA sono stati scaricati.")
 
-    if shas_gen and len(overlap) / len(shas_gen) > 0.9:
-        print("\nConclusione: overlap alto -> usare max(co_authored, generated)")
-    elif shas_gen:
-        print("\nConclusione: overlap basso -> la somma aggiunge informazione")
+    # Senza campionamento l'unione e' esatta e deve coincidere con la query
+    # combinata; altrimenti si verificano solo i limiti max(co, gen) e co + gen.
+    co_total = results["co_authored"]["total_count"]
+    gen_total = results["generated"]["total_count"]
+    if not capped:
+        consistent = combined_count == len(union)
+    else:
+        consistent = max(co_total, gen_total) <= combined_count <= co_total + gen_total
+    if consistent:
+        print("\nConclusione: la query combinata (claude_commits) conta l'unione dei due pattern")
+    else:
+        print("\nConclusione: la query combinata NON corrisponde all'unione dei due pattern,"
+              " verificare la sintassi OR")
 
     print("=" * 60)
 